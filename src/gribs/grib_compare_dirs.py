@@ -1,22 +1,20 @@
 #!/usr/bin/env python3
 
+import os
 import re
-import math
+import fnmatch
 from pathlib import Path
 import argparse
-import datetime as dt
-
-from os import stat
-from glob import glob
-
-from gribs.gribmapper import GribMapper
 
 _n = "\n"
 
+_STEM_RE = re.compile(r"(CMC[^/\n]+?)_\d{10}_")
+_GRIB_MATCH = re.compile(fnmatch.translate("*.grib?")).match
+
 def list_gribs(dir):
-    grib_files = list()
     if dir.is_dir():
-        grib_files = [str(f) for f in dir.glob("*.grib?")]
+        with os.scandir(dir) as it:
+            grib_files = [e.path for e in it if e.is_file() and _GRIB_MATCH(e.name)]
         if not grib_files:
             raise Exception(f"Dir {dir} contains no grib files.")
     else:
@@ -24,20 +22,23 @@ def list_gribs(dir):
     return grib_files
 
 def stem(name):
-    return re.match(".+(CMC.+)_\d{10}_", name).group(1)
+    return os.path.basename(name).rsplit("_", 2)[0]
+
+def stems(names):
+    return set(_STEM_RE.findall(_n.join(names)))
 
 def diff(dir1, dir2):
     cmc_files1 = list_gribs(dir1)
     cmc_files2 = list_gribs(dir2)
 
-    stems1 = [stem(name) for name in cmc_files1]
-    stems2 = [stem(name) for name in cmc_files2]
+    stems1 = stems(cmc_files1)
+    stems2 = stems(cmc_files2)
 
-    if set(stems1)==set(stems2):
+    if stems1==stems2:
         print("Both directories contain matching layers.")
     else:
-        dif1 = sorted(set(stems1)-set(stems2))
-        dif2 = sorted(set(stems2)-set(stems1))
+        dif1 = sorted(stems1-stems2)
+        dif2 = sorted(stems2-stems1)
         dc = len(dif1) + len(dif2)
         print(f"Found {dc} differences between directories.")
         if dif1:
@@ -5,10 +5,15 @@ from gribs.gribmapper import GribMapper
 def cli():
     parser = argparse.ArgumentParser(description="List grib files contents to stdout")
     parser.add_argument("source", type=pathlib.Path, help="Source file")
+    parser.add_argument("-s", "--stats", action="store_true", help="Also print min/max of each field (decodes values)")
     args = parser.parse_args()
 
-    for gm in GribMapper.from_path(str(args.source)):
-        gm.list()
+    if args.stats:
+        for gm in GribMapper.from_path(args.source):
+            gm.list(stats=True)
+    else:
+        for fname, name, level, level_type, units in GribMapper.iter_list_rows(args.source):
+            print(f"{fname}: {name}, level: {level}, level type: {level_type}, units: {units}")
 
 if __name__=="__main__":
     cli()
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
 import builtins
+import contextlib
+import functools
+import os
 import pathlib
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-import fstd2nc
 import rpnpy.librmn.all as rmn
-from eccodes import GribFile, GribMessage
+import eccodes
 
 from gribs.units import Unit
 
@@ -22,6 +26,122 @@ IP_KIND_SIGMA = 1
 IP_KIND_PRESSURE = 2
 IP_KIND_ARBITRARY = 3
 
+_GRID_CACHE = {}
+
+@functools.lru_cache(maxsize=1024)
+def _convert_ip(mode, level, kind):
+    return rmn.convertIp(mode, level, kind)
+
+_FSTD_CONFIGURED = False
+
+def _configure_fstd_once():
+    # fstopt options are process-global, set them a single time
+    global _FSTD_CONFIGURED
+    if not _FSTD_CONFIGURED:
+        rmn.fstopt(rmn.FSTOP_MSGLVL, rmn.FSTOPI_MSG_CATAST)
+        rmn.fstopt(rmn.FSTOP_TOLRNC, rmn.FSTOPI_MSG_CATAST)
+        _FSTD_CONFIGURED = True
+
+class _BufferPool():
+    """
+    Reuse float32 scratch buffers per flat grid size so batch
+    conversions do not reallocate ni*nj*4 bytes for every message.
+    """
+    def __init__(self):
+        self._free = {}
+
+    def acquire(self, size):
+        bufs = self._free.get(size)
+        if bufs:
+            return bufs.pop()
+        return np.empty(size, dtype=np.float32)
+
+    def release(self, buf):
+        self._free.setdefault(buf.size, []).append(buf)
+
+_BUF_POOL = _BufferPool()
+
+# Header keys prefetched in one pass at construction; "values" stays lazy.
+_HDR_KEYS = (
+    "name",
+    "level",
+    "typeOfLevel",
+    "parameterUnits",
+    "gridDescriptionSectionPresent",
+    "gridDefinitionDescription",
+    "Ni",
+    "Nj",
+    "iDirectionIncrementInDegrees",
+    "jDirectionIncrementInDegrees",
+    "latitudeOfFirstGridPoint",
+    "longitudeOfFirstGridPoint",
+    "angleDivisor",
+    "validityDate",
+    "validityTime",
+    "forecastTime",
+    "scaleFactorOfSecondFixedSurface",
+)
+
+def _read_headers(msg):
+    hdr = {}
+    for key in _HDR_KEYS:
+        try:
+            hdr[key] = msg[key]
+        except eccodes.KeyValueNotFoundError:
+            pass
+    return hdr
+
+class _RawMessage():
+    """
+    Minimal mapping over a raw eccodes handle. Skips the high-level
+    GribFile/GribMessage wrapping layer on hot key lookups.
+    """
+    def __init__(self, handle, filename):
+        self._handle = handle
+        self.filename = filename
+
+    def __getitem__(self, key):
+        if key == "values":
+            return eccodes.codes_get_values(self._handle)
+        return eccodes.codes_get(self._handle, key)
+
+def _convert_slice(path, indices, target, etiket, ip_oldstyle, verbose):
+    indices = set(indices)
+    iunit = None
+    try:
+        for i, gm in enumerate(GribMapper.from_path(path)):
+            if i not in indices:
+                continue
+            gm.etiket = etiket
+            if gm.is_recognized():
+                if iunit is None:
+                    # parts are run-private temporaries; clobber any stale
+                    # leftover from an interrupted run
+                    iunit = GribMapper.open_fst(target, overwrite=True, verbose=verbose)
+                gm.to_rpn(ip_oldstyle=ip_oldstyle, verbose=verbose, iunit=iunit)
+    finally:
+        if iunit is not None:
+            GribMapper.close_fst(iunit)
+
+def _merge_fst(parts, target, overwrite):
+    if target.exists() and overwrite:
+        target.unlink()
+    out_id = rmn.fstopenall(str(target), rmn.FST_RW)
+    try:
+        for part in parts:
+            if not part.exists():
+                continue
+            in_id = rmn.fstopenall(str(part), rmn.FST_RO)
+            try:
+                for key in rmn.fstinl(in_id):
+                    rec = rmn.fstluk(key)
+                    rmn.fstecr(iunit=out_id, data=rec["d"], meta=rec, rewrite=True)
+            finally:
+                rmn.fstcloseall(in_id)
+                part.unlink()
+    finally:
+        rmn.fstcloseall(out_id)
+
 class GribMapper():
     VARS = {
         "Albedo":
@@ -115,15 +235,37 @@ class GribMapper():
         }
     }
 
+    _DEFAULT = ("UNKN", "ip1_from_level", Unit.ident)
+
+    # nomvar is padded to its 4-char FSTD width at table build time
+    # so the hot path never reformats it.
+    _FLAT = {}
+    for _name, _var in VARS.items():
+        for _lvl, _nv in _var["nomvar"].items():
+            _FLAT[(_name, _lvl)] = (f"{_nv:<4}",
+                                    _var.get("ip1", {}).get(_lvl, "ip1_from_level"),
+                                    _var.get("unit", Unit.ident))
+    del _name, _var, _lvl, _nv
+
     def __init__(self):
         self._ip_oldstyle = False
         self._fstd_id = None
         self._verbose = False
-        self._etiket = ""
+        self._etiket = f"{'':<12}"
+        self._unit_func = Unit.ident
+        self._data_buf = None
+        self._data_cache = None
 
-    def __del__(self):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
         if self._fstd_id:
             rmn.fstcloseall(self._fstd_id)
+            self._fstd_id = None
 
     def __repr__(self):
         return f"{self._filename}, nomvar: {self.nomvar}, ip1: {self.ip1}"
@@ -135,63 +277,132 @@ class GribMapper():
     def from_grib_message(cls, msg):
         gm = cls()
         gm._msg = msg
-        gm._filename = msg.grib_file.name
-        gm._level = msg["level"]
-        gm._level_type = msg["typeOfLevel"]
-        gm._gribvar = msg["name"]
+        gm._hdr = _read_headers(msg)
+        gm._filename = msg.filename
+        gm._level = gm._hdr["level"]
+        gm._level_type = gm._hdr["typeOfLevel"]
+        gm._gribvar = gm._hdr["name"]
         return gm
 
     @classmethod
     def from_grib_file(cls, grib_file):
-        if isinstance(grib_file, GribFile):
-            for msg in grib_file:
-                yield cls().from_grib_message(msg)
+        """
+        Yield mappers from an already-opened binary grib file object.
+        """
+        name = getattr(grib_file, "name", "")
+        while True:
+            handle = eccodes.codes_grib_new_from_file(grib_file)
+            if handle is None:
+                break
+            try:
+                yield cls.from_grib_message(_RawMessage(handle, name))
+            finally:
+                eccodes.codes_release(handle)
 
     @classmethod
     def from_path(cls, path):
         try:
-            gf = GribFile(str(path))
-        except IOError as e:
-            raise e(f"Problem loading file {str(path)}")
-        for msg in gf:
-            yield cls().from_grib_message(msg)
-
-    def translate_to_rpn(self):
-        try:
-            self._var = self.VARS[self._gribvar]
-        except KeyError:
-            self._var = {"UNKNOWN": {}}
+            f = open(str(path), "rb")
+        except IOError:
+            raise IOError(f"Problem loading file {str(path)}")
+        with f:
+            yield from cls.from_grib_file(f)
 
-        try:
-            ip1_func = self._var["ip1"][self._level_type]
-        except KeyError:
-            ip1_func = "ip1_from_level"
-        self._ip1 = getattr(self, ip1_func)()
+    @classmethod
+    def batch_to_rpn(cls, path, target, n_workers=None, overwrite=False,
+                     etiket="", ip_oldstyle=False, verbose=False):
+        """
+        Convert every recognized message of a grib file on a process pool.
+        librmn is not thread safe, so workers are separate processes writing
+        per-worker temporary files which are merged serially at the end.
+        """
+        n_workers = n_workers or os.cpu_count()
+        with open(str(path), "rb") as f:
+            count = eccodes.codes_count_in_file(f)
+        target = pathlib.Path(target)
+        slices = [range(w, count, n_workers) for w in range(min(n_workers, count) or 1)]
+        # append to the full name so targets differing only in extension
+        # cannot collide on the same part file
+        parts = [target.with_name(f"{target.name}.part{w}") for w in range(len(slices))]
+        # a worker only opens its part on the first recognized message, so
+        # stale parts from an interrupted run must be removed before the pool
+        # starts or _merge_fst would pick them up
+        for part in parts:
+            if part.exists():
+                part.unlink()
+        with ProcessPoolExecutor(max_workers=len(slices)) as pool:
+            futures = [pool.submit(_convert_slice, str(path), list(sl), part,
+                                   etiket, ip_oldstyle, verbose)
+                       for sl, part in zip(slices, parts)]
+            for future in futures:
+                future.result()
+        _merge_fst(parts, target, overwrite)
 
-        try:
-            self._nomvar = self._var["nomvar"][self._level_type]
-        except KeyError:
-            self._nomvar = "UNKN"
+    @classmethod
+    def iter_list_rows(cls, path):
+        """
+        Yield (filename, name, level, level type, units) tuples
+        without building a full GribMapper per message.
+        """
+        with open(str(path), "rb") as f:
+            while True:
+                handle = eccodes.codes_grib_new_from_file(f)
+                if handle is None:
+                    break
+                try:
+                    yield (str(path),
+                           eccodes.codes_get(handle, "name"),
+                           eccodes.codes_get(handle, "level"),
+                           eccodes.codes_get(handle, "typeOfLevel"),
+                           eccodes.codes_get(handle, "parameterUnits"))
+                finally:
+                    eccodes.codes_release(handle)
 
-        try:
-            self._unit_func = self._var["unit"]
-        except KeyError:
-            self._unit_func = Unit.ident
+    def translate_to_rpn(self):
+        key = (self._gribvar, self._level_type)
+        self._nomvar, ip1_func, self._unit_func = self._FLAT.get(key, self._DEFAULT)
+        self._ip1 = getattr(self, ip1_func)()
 
     @property
     def _dlon(self):
-        return self._msg["iDirectionIncrementInDegrees"]
+        return self._hdr["iDirectionIncrementInDegrees"]
 
     @property
     def _dlat(self):
-        return self._msg["jDirectionIncrementInDegrees"]
+        return self._hdr["jDirectionIncrementInDegrees"]
 
     @property
     def data(self):
-        field = self._msg["values"]
-        values = self._convert_unit(field)
-        d64 = np.reshape(values, (self.ni, self.nj), order='F')
-        return np.float32(d64)
+        """
+        Converted field as a float32 (ni, nj) array.
+
+        Layout contract: the backing buffer is C-contiguous in the
+        (nj, ni) orientation eccodes decodes into; the returned array
+        is its transpose, i.e. an F-contiguous (ni, nj) view with no
+        copy and no order='F' reshape, which is what fstecr expects.
+
+        Lifetime contract: the buffer comes from a shared pool and is
+        recycled by to_rpn once the record is written, after which the
+        next decode overwrites it. Callers that need the array beyond
+        to_rpn must take their own copy first.
+        """
+        if self._data_cache is None:
+            raw = self._msg["values"]
+            buf = _BUF_POOL.acquire(raw.size)
+            # the first ufunc pass writes straight into the float32 buffer,
+            # fusing the float64 -> float32 cast with the unit conversion
+            self._unit_func(raw, out=buf)
+            # eccodes stores values row-major as (nj, ni); the transpose is a
+            # free stride swap yielding the (ni, nj) F-order layout fstecr expects.
+            self._data_buf = buf
+            self._data_cache = buf.reshape(self.nj, self.ni).T
+        return self._data_cache
+
+    def _invalidate(self):
+        if self._data_cache is not None:
+            _BUF_POOL.release(self._data_buf)
+            self._data_buf = None
+            self._data_cache = None
 
     @property
     def etiket(self):
@@ -199,7 +410,7 @@ class GribMapper():
 
     @etiket.setter
     def etiket(self, value):
-        self._etiket = value
+        self._etiket = f"{value:<12}"
 
     @property
     def ip1(self):
@@ -211,19 +422,19 @@ class GribMapper():
 
     @property
     def _lat_zero(self):
-        return self._msg["latitudeOfFirstGridPoint"] / self._msg["angleDivisor"]
+        return self._hdr["latitudeOfFirstGridPoint"] / self._hdr["angleDivisor"]
 
     @property
     def _lon_zero(self):
-        return self._msg["longitudeOfFirstGridPoint"] / self._msg["angleDivisor"]
+        return self._hdr["longitudeOfFirstGridPoint"] / self._hdr["angleDivisor"]
 
     @property
     def ni(self):
-        return self._msg["Ni"]
+        return self._hdr["Ni"]
 
     @property
     def nj(self):
-        return self._msg["Nj"]
+        return self._hdr["Nj"]
 
     @property
     def gribvar(self):
@@ -231,11 +442,11 @@ class GribMapper():
 
     @property
     def nomvar(self):
-        return f"{self._nomvar:<4}"
+        return self._nomvar
 
     @nomvar.setter
     def nomvar(self, value):
-        self._nomvar = value
+        self._nomvar = f"{value:<4}"
  
     @property
     def oldstyle(self):
@@ -253,18 +464,15 @@ class GribMapper():
     def verbose(self, value):
         self._verbose = value
 
-    def _convert_unit(self, value):
-        return self._unit_func(value)
-
     def get_ip_code(self, level, kind=IP_KIND_ARBITRARY):
         if self._ip_oldstyle:
             mode = 3
         else:
             mode = 2
-        return rmn.convertIp(mode, level, kind)
+        return _convert_ip(mode, level, kind)
 
     def has_grid(self):
-        return self._msg["gridDescriptionSectionPresent"] == 1
+        return self._hdr["gridDescriptionSectionPresent"] == 1
 
     def ip1_soilw_dbll(self):
         """
@@ -273,7 +481,7 @@ class GribMapper():
         Level 100 has value 1  -> coded to IP1 1.0 (1199 or 59868832 NEWSTYLE)
         Level 10 has value 2 -> coded to IP1 2.0 (1198 or 59968832 NEWSTYLE)
         """
-        factor = int(self._msg["scaleFactorOfSecondFixedSurface"])
+        factor = int(self._hdr["scaleFactorOfSecondFixedSurface"])
         return self.get_ip_code(level=factor)
         
     def ip1_snod_sfc(self):
@@ -294,34 +502,32 @@ class GribMapper():
         return ip
 
     def is_latlon(self):
-        return self._msg["gridDefinitionDescription"] == "Latitude/longitude "
+        return self._hdr["gridDefinitionDescription"] == "Latitude/longitude "
 
     def is_convertable(self):
         return self.has_grid() and self.is_latlon()
 
     def is_recognized(self):
-        try:
-            level_known = self._level_type in self.VARS[self.gribvar]["nomvar"]
-            if level_known and self.is_convertable():
-                return True
-        except KeyError:
-            return False
-        return False
+        return (self._gribvar, self._level_type) in self._FLAT and self.is_convertable()
 
     def _infer_fstd_params(self):
         pass
 
     def _get_fstd_grid_meta(self):
         grtyp = 'L'
-        (ig1, ig2, ig3, ig4) = rmn.cxgaig(grtyp, self._lat_zero, self._lon_zero, self._dlat, self._dlon)
-        gid = rmn.ezqkdef(self.ni, self.nj, grtyp, ig1, ig2, ig3, ig4)
-        return rmn.ezgprm(gid)
+        key = (grtyp, self._lat_zero, self._lon_zero, self._dlat, self._dlon, self.ni, self.nj)
+        params = _GRID_CACHE.get(key)
+        if params is None:
+            (ig1, ig2, ig3, ig4) = rmn.cxgaig(grtyp, self._lat_zero, self._lon_zero, self._dlat, self._dlon)
+            gid = rmn.ezqkdef(self.ni, self.nj, grtyp, ig1, ig2, ig3, ig4)
+            params = _GRID_CACHE[key] = rmn.ezgprm(gid)
+        return dict(params)  # shallow copy, callers mutate the result
 
     def _fstd_meta(self):
         params = self._get_fstd_grid_meta()
-        date_valid = self._msg["validityDate"]
-        time_valid = self._msg["validityTime"]
-        hour_forec = self._msg["forecastTime"]
+        date_valid = self._hdr["validityDate"]
+        time_valid = self._hdr["validityTime"]
+        hour_forec = self._hdr["forecastTime"]
         params["dtype"] = 1
         params["shape"] = (self.ni, self.nj, 1)
         params["dateo"] = rmn.newdate(3, date_valid, time_valid * 1_00_00)
@@ -335,42 +541,120 @@ class GribMapper():
         params["ip3"] = 0
         params["typvar"] = "P "
         params["nomvar"] = self.nomvar
-        params["etiket"] = f"{self._etiket:<12}"
+        params["etiket"] = self._etiket
         params["d"] = self.data
         return params
 
-    def _init_fstd_file(self, target, overwrite):
+    @classmethod
+    def open_fst(cls, target, overwrite=False, verbose=False):
+        """
+        Open a target FSTD file once for a batch of writes.
+        """
+        target = pathlib.Path(target)
         if target.exists() and overwrite:
             target.unlink()
-        if not self._verbose:
-            rmn.fstopt(rmn.FSTOP_MSGLVL, rmn.FSTOPI_MSG_CATAST)
-            rmn.fstopt(rmn.FSTOP_TOLRNC, rmn.FSTOPI_MSG_CATAST)
-        self._fstd_id = rmn.fstopenall(str(target), rmn.FST_RW)
+        if not verbose:
+            _configure_fstd_once()
+        return rmn.fstopenall(str(target), rmn.FST_RW)
+
+    @classmethod
+    def close_fst(cls, iunit):
+        rmn.fstcloseall(iunit)
+
+    def _init_fstd_file(self, target, overwrite):
+        self._fstd_id = self.open_fst(target, overwrite, self._verbose)
         return self._fstd_id
 
-    def list(self, print=builtins.print):
-        print(f"{self._filename}: "
-              f"{self.gribvar}, "
-              f"level: {self._level}, "
-              f"level type: {self._level_type}, "
-              f"units: {self._msg['parameterUnits']}")
+    def list(self, print=builtins.print, stats=False):
+        line = (f"{self._filename}: "
+                f"{self.gribvar}, "
+                f"level: {self._level}, "
+                f"level type: {self._level_type}, "
+                f"units: {self._hdr['parameterUnits']}")
+        if stats:
+            # single cached decode serves both reductions
+            arr = self.data
+            line += f", min: {arr.min()}, max: {arr.max()}"
+        print(line)
 
     def plot(self):
         raise NotImplementedError
 
-    def to_rpn(self, target, overwrite=False, ip_oldstyle=False, verbose=False):
+    def to_rpn(self, target=None, overwrite=False, ip_oldstyle=False, verbose=False, iunit=None):
         self._verbose = verbose
         self._ip_oldstyle = ip_oldstyle
         self.translate_to_rpn()
-        self._fstd_id = self._init_fstd_file(target, overwrite)
+        if iunit is None:
+            iunit = self._init_fstd_file(target, overwrite)
         try:
-            rmn.fstecr(iunit=self._fstd_id, data=self.data, meta=self._fstd_meta(), rewrite=True)
+            meta = self._fstd_meta()
+            rmn.fstecr(iunit=iunit, data=meta["d"], meta=meta, rewrite=True)
         except rmn.FSTDError:
             raise IOError("Problem writing rpn record")
-        rmn.fstcloseall(self._fstd_id)
-        self._fstd_id = None
+        finally:
+            self.close()
+            self._invalidate()  # fstecr copied the data, recycle the buffer
+
+    @classmethod
+    @contextlib.contextmanager
+    def csv_writer(cls, target):
+        """
+        Open the target once with a large buffer for a batch of rows:
+        with GribMapper.csv_writer(target) as w:
+            for gm in GribMapper.from_path(path):
+                w.write(gm._csv_line() + "\n")
+        """
+        with open(target, "a", buffering=1 << 20) as f:
+            yield f
+
+    def _csv_line(self):
+        return f"{self._filename},{self.nomvar},{self.ip1},{self.gribvar},{self._level},{self._hdr['parameterUnits']}"
 
     def to_csv(self, target, overwrite=False):
-        with open(target, "a") as f:
-            csv_line = f"{self._filename},{self.nomvar},{self.ip1},{self.gribvar},{self._level},{self._msg['parameterUnits']}"
-            f.write(csv_line)
+        with self.csv_writer(target) as f:
+            f.write(self._csv_line() + "\n")
+
+class GribBatch():
+    """
+    Accumulate records grouped by grid and flush them in one open FST
+    session, with each grid's slabs co-located in a single F-order stack:
+    with GribBatch(target, overwrite=True) as batch:
+        for gm in GribMapper.from_path(path):
+            if gm.is_recognized():
+                batch.append(gm)
+    """
+    def __init__(self, target, overwrite=False, verbose=False):
+        self._target = target
+        self._overwrite = overwrite
+        self._verbose = verbose
+        self._groups = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def append(self, gm):
+        gm.translate_to_rpn()
+        meta = gm._fstd_meta()
+        key = (meta["ni"], meta["nj"], meta["grtyp"],
+               meta["ig1"], meta["ig2"], meta["ig3"], meta["ig4"])
+        self._groups.setdefault(key, []).append(meta)
+
+    def flush(self):
+        if not self._groups:
+            return
+        iunit = GribMapper.open_fst(self._target, self._overwrite, self._verbose)
+        try:
+            for metas in self._groups.values():
+                ni, nj = metas[0]["ni"], metas[0]["nj"]
+                stack = np.empty((ni, nj, len(metas)), dtype=np.float32, order="F")
+                for k, meta in enumerate(metas):
+                    stack[:, :, k] = meta["d"]
+                for k, meta in enumerate(metas):
+                    rmn.fstecr(iunit=iunit, data=stack[:, :, k], meta=meta, rewrite=True)
+        finally:
+            GribMapper.close_fst(iunit)
+        self._groups.clear()
@@ -1,14 +1,17 @@
-import sys
+import os
+import fnmatch
 import pathlib
 import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 
-from gribs.gribmapper import GribMapper
+from gribs.gribmapper import GribMapper, _merge_fst
 
 RGB_G = "\u001b[32m" 
 RGB_B = "\u001b[34m"
 RGB_0 = "\u001b[0m"
 
-def convert(path, args):
+def convert(path, args, iunit=None):
     CR = RGB_G if args.color else RGB_0
     CG = RGB_B if args.color else RGB_0
     C0 = RGB_0
@@ -19,13 +22,23 @@ def convert(path, args):
             print(f"{CR}... {str(path.name)} - Converting {gm.gribvar} @ {gm._level_type} ({gm._level}){C0}")
             if not args.dry:
                 gm.to_rpn(target=args.target,
-                          overwrite=args.overwrite,
                           ip_oldstyle=args.oldstyle,
-                          verbose=args.verbose)
+                          verbose=args.verbose,
+                          iunit=iunit)
         else:
             print(f"{CG}??? {str(path.name)} -",
                 f"{gm.gribvar} @ {gm._level_type} ({gm._level}) is missing from GribMapper dictionary.{C0}")
 
+def _convert_shard(paths, args, part):
+    # parts are run-private temporaries; clobber any stale leftover
+    # from an interrupted run
+    iunit = GribMapper.open_fst(part, overwrite=True, verbose=args.verbose)
+    try:
+        for path in paths:
+            convert(path, args, iunit)
+    finally:
+        GribMapper.close_fst(iunit)
+
 def cli():
     parser = argparse.ArgumentParser(description="Convert grib files to rpn format")
     parser.add_argument("source", nargs="+", type=pathlib.Path, help="List of dirs and/or grib files")
@@ -34,19 +47,52 @@ def cli():
     group1 = parser.add_argument_group('fstd options')
     group1.add_argument("-e", "--etiket", type=str, default="G092V3N", help="Set etiket column value for resulting rpn file.")
     group1.add_argument("--oldstyle", action="store_true", help="Code IP1 values in oldstyle format.")
-    group1.add_argument("-o", "--overwrite", action="store_true", help="Overwrite target file if exists. Not useful when converting multiple files at once -- the target will be deleted before every iteration.")
+    group1.add_argument("-o", "--overwrite", action="store_true", help="Overwrite target file if exists. Applied once before conversion starts.")
     group1.add_argument("-v", "--verbose", action="store_true", help="Display FSTD output")
     group2 = parser.add_argument_group('other options')
     group2.add_argument("-d", "--dry", action="store_true", help="Dry run with no actual file saving")
     group2.add_argument("-c", "--color", action="store_true", help="Use color for messages")
+    group2.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Convert files on this many worker processes, merging per-worker temporary files into the target at the end.")
     args = parser.parse_args()
 
+    files = []
     for pt in args.source:
         if pt.is_file():
-            convert(pt, args)
+            files.append(pt)
         elif pt.is_dir():
-            for f in sorted(pt.glob(args.glob)):
-                convert(f, args)
+            if os.sep in args.glob or "**" in args.glob:
+                # path-bearing patterns need pathlib's full glob machinery
+                files.extend(sorted(pt.glob(args.glob)))
+            else:
+                with os.scandir(pt) as it:
+                    names = sorted(e.name for e in it if fnmatch.fnmatch(e.name, args.glob))
+                files.extend(pt / name for name in names)
+
+    if args.jobs > 1 and not args.dry:
+        shards = [files[w::args.jobs] for w in range(args.jobs)]
+        parts = [args.target.with_name(f"{args.target.name}.part{w}") for w in range(args.jobs)]
+        # empty shards are never submitted and a worker only opens its part
+        # lazily, so stale parts from an interrupted run must be removed
+        # before the pool starts or _merge_fst would pick them up
+        for part in parts:
+            if part.exists():
+                part.unlink()
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(_convert_shard, shard, args, part)
+                       for shard, part in zip(shards, parts) if shard]
+            for future in futures:
+                future.result()
+        _merge_fst(parts, args.target, args.overwrite)
+        return
+
+    with contextlib.ExitStack() as stack:
+        iunit = None
+        if not args.dry:
+            iunit = GribMapper.open_fst(args.target, overwrite=args.overwrite, verbose=args.verbose)
+            stack.callback(GribMapper.close_fst, iunit)
+        for f in files:
+            convert(f, args, iunit)
 
 if __name__=="__main__":
     cli()
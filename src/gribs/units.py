@@ -1,29 +1,41 @@
+import numpy as np
+
+class Affine():
+    """
+    Affine unit transform value*scale + offset.
+    With an out buffer the passes run in place, and identity factors
+    are skipped entirely, so most conversions cost a single ufunc pass.
+    """
+    def __init__(self, scale=1.0, offset=0.0):
+        self.scale = scale
+        self.offset = offset
+
+    def __call__(self, value, out=None):
+        if out is None:
+            if self.scale != 1.0:
+                value = value * self.scale
+            if self.offset != 0.0:
+                value = value + self.offset
+            return value
+        if self.scale != 1.0:
+            np.multiply(value, self.scale, out=out)
+            value = out
+        if self.offset != 0.0:
+            np.add(value, self.offset, out=out)
+            value = out
+        if value is not out:
+            np.copyto(out, value)
+        return out
+
 class Unit():
     """
-    Simple unit conversion functions.
+    Simple unit conversions expressed as affine transforms.
     Use pint or other fully fledged lib
     in case more comprehensive conversions are needed.
     """
-    @staticmethod
-    def ident(value):
-        return value
-
-    @staticmethod
-    def m_per_s_to_kt(value):
-        return value * 1.9438
-
-    @staticmethod
-    def K_to_C(value):
-        return value - 273.15
-
-    @staticmethod
-    def m_to_cm(value):
-        return value * 100
-
-    @staticmethod
-    def gpm_to_dam(value):
-        return value * 0.1
-
-    @staticmethod
-    def Pa_to_hPa(value):
-        return value * 0.01
\ No newline at end of file
+    ident = Affine()
+    m_per_s_to_kt = Affine(scale=1.9438)
+    K_to_C = Affine(offset=-273.15)
+    m_to_cm = Affine(scale=100)
+    gpm_to_dam = Affine(scale=0.1)
+    Pa_to_hPa = Affine(scale=0.01)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+import unittest
+from gribs.grib_compare_dirs import stem, stems
+
+class TestStem(unittest.TestCase):
+    def test_stem(self):
+        name = "/test_data/grib/2021102600/CMC_glb_ABSV_ISBL_200_latlon.15x.15_2021102600_P000.grib2"
+        self.assertEqual(stem(name), "CMC_glb_ABSV_ISBL_200_latlon.15x.15")
+
+    def test_stems(self):
+        names = ["/test_data/grib/2021102600/CMC_glb_ABSV_ISBL_200_latlon.15x.15_2021102600_P000.grib2",
+                 "/test_data/grib/2021102600/CMC_glb_TMP_TGL_2_latlon.15x.15_2021102600_P000.grib2"]
+        self.assertEqual(stems(names),
+                         {"CMC_glb_ABSV_ISBL_200_latlon.15x.15", "CMC_glb_TMP_TGL_2_latlon.15x.15"})
+
+if __name__ == '__main__':
+    unittest.main()
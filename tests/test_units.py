@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import unittest
+import numpy as np
+from gribs.units import Affine, Unit
+
+class TestAffine(unittest.TestCase):
+    def test_array_without_out(self):
+        arr = np.array([273.15, 274.15])
+        res = Unit.K_to_C(arr)
+        self.assertTrue(np.allclose(res, [0.0, 1.0]))
+        self.assertTrue(np.allclose(arr, [273.15, 274.15]))  # input untouched
+
+    def test_array_with_out_in_place(self):
+        arr = np.array([1.0, 2.0], dtype=np.float32)
+        res = Unit.m_to_cm(arr, out=arr)
+        self.assertIs(res, arr)
+        self.assertTrue(np.allclose(arr, [100.0, 200.0]))
+
+    def test_out_fuses_cast(self):
+        src = np.array([273.15, 274.15], dtype=np.float64)
+        out = np.empty(2, dtype=np.float32)
+        res = Unit.K_to_C(src, out=out)
+        self.assertIs(res, out)
+        self.assertEqual(out.dtype, np.float32)
+        self.assertTrue(np.allclose(out, [0.0, 1.0]))
+
+    def test_ident_with_out_copies(self):
+        src = np.array([1.5, 2.5], dtype=np.float64)
+        out = np.empty(2, dtype=np.float32)
+        res = Unit.ident(src, out=out)
+        self.assertIs(res, out)
+        self.assertTrue(np.allclose(out, [1.5, 2.5]))
+
+    def test_scale_and_offset(self):
+        t = Affine(scale=2.0, offset=1.0)
+        self.assertEqual(t(3.0), 7.0)
+        arr = np.array([1.0, 2.0], dtype=np.float32)
+        res = t(arr, out=arr)
+        self.assertIs(res, arr)
+        self.assertTrue(np.allclose(arr, [3.0, 5.0]))
+
+if __name__ == '__main__':
+    unittest.main()